@@ -1,39 +1,81 @@
 from __future__ import annotations
 
 import re
-import subprocess
+import shlex
 import sys
-from typing import Optional, Any, List, Tuple
+from collections import Counter
+from typing import Optional, Any, Callable, List
 
-import typer
-from rich.console import Console
-from rich.table import Table
+from .config import ConfigError, KToolConfig, load_config
+from . import kube, kube_api
+from .kube import KubectlError
 
-from .config import load_config
-from .kube import get_pods_json
 
-# Allow us to accept arbitrary arg order and parse ourselves
-app = typer.Typer(
-    add_completion=False,
-    help="kubectl shortcuts + search + summaries",
-    context_settings={"allow_extra_args": True, "ignore_unknown_options": True},
-    no_args_is_help=False,
-)
-ctx_app = typer.Typer(add_completion=False, help="Context shortcuts (like kubectx)")
+class UsageError(ValueError):
+    pass
 
-console = Console()
 
-
-def resolve_namespace(ns: Optional[str]) -> str:
-    cfg = load_config()
-    return ns or cfg.default_namespace
-
-
-def resolve_service(tag: Optional[str]) -> Optional[str]:
-    if not tag:
-        return None
-    cfg = load_config()
-    return cfg.services.get(tag, tag)
+def resolve(
+        cfg: KToolConfig, namespace: Optional[str], tags: List[str]
+) -> tuple[str, Optional[re.Pattern[str]], Optional[str]]:
+    """
+    Return (namespace, service name pattern, label selector) for the CLI inputs.
+    Several tags match a pod if any of them does.
+    """
+    ns = namespace or cfg.default_namespace
+    if not tags:
+        return ns, None, None
+    labelled = [t for t in tags if t in cfg.selectors]
+    if labelled:
+        if len(tags) > 1:
+            # kubectl can't OR label selectors, and these tags have no name to match on
+            raise UsageError(
+                f"Service {', '.join(labelled)} uses a label selector and can't be combined with other services"
+            )
+        # applied server-side; no name matching needed
+        return ns, None, cfg.selectors[tags[0]]
+
+    patterns = []
+    for t in tags:
+        if t in cfg.services and not cfg.services[t]:
+            # configured without a name: matches every pod, so no name filter at all
+            return ns, None, None
+        patterns.append(cfg.resolved_services.get(t) or re.compile(re.escape(t)))
+    if len(patterns) == 1:
+        return ns, patterns[0], None
+    return ns, re.compile("|".join(p.pattern for p in patterns)), None
+
+
+# flags of a pattern with no inline global flags, e.g. re.UNICODE for str patterns
+_DEFAULT_RE_FLAGS = re.compile("").flags
+
+
+def build_matcher(
+        svc: Optional[re.Pattern[str]], search: Optional[str]
+) -> Optional[Callable[[str], Any]]:
+    """
+    Return a predicate over pod names combining the service pattern and
+    the --search regex, or None when there is nothing to filter on.
+    """
+    # validate --search on its own first, so fusing it below can't change its meaning
+    search_re = None
+    if search:
+        try:
+            search_re = re.compile(search)
+        except re.error as e:
+            raise UsageError(f"Invalid --search pattern: {e}") from e
+    if svc and search_re:
+        if search_re.flags == _DEFAULT_RE_FLAGS:
+            # both tests in one scan of the name
+            return re.compile(f"(?=.*(?:{svc.pattern}))(?=.*(?:{search}))").match
+        # inline global flags such as (?i) would apply to the service half too once
+        # fused (Python 3.10 only warns about them mid-pattern), so test separately
+        return lambda name: svc.search(name) and search_re.search(name)
+    if svc:
+        return svc.search
+    if search_re:
+        return search_re.search
+    return None
 
 
 def pod_state(pod: dict[str, Any]) -> tuple[str, bool]:
@@ -55,198 +97,200 @@ def pod_state(pod: dict[str, Any]) -> tuple[str, bool]:
     return phase, bad
 
 
+def _note(console: Any, message: str, style: str) -> None:
+    """Status line: styled on a terminal, plain on stderr so it stays out of piped output."""
+    if console is None:
+        print(message, file=sys.stderr)
+    else:
+        console.print(message, style=style, markup=False, highlight=False)
+
+
 def pods_impl(
-        service: Optional[str],
+        services: List[str],
         namespace: Optional[str],
         search: Optional[str],
         summary: bool,
         bad_only: bool,
         show_command: bool,
+        no_cache: bool = False,
+        plain: bool = False,
 ):
-    ns = resolve_namespace(namespace)
-    svc = resolve_service(service)
+    # rich is only needed for terminal rendering; plain/piped output never imports it
+    console = None
+    if not plain and sys.stdout.isatty():
+        from rich.console import Console
 
-    # Show the actual kubectl command if requested
-    if show_command:
-        cmd = ["kubectl", "get", "pods", "-n", ns, "-o", "json"]
-        console.print(f"[dim]Running: {' '.join(cmd)}[/dim]")
+        console = Console()
 
-    data = get_pods_json(ns)
-    items = data.get("items", []) or []
-
-    filtered = []
-    for pod in items:
+    cfg = load_config()
+    ns, svc, selector = resolve(cfg, namespace, services)
+
+    match = build_matcher(svc, search)
+
+    # the kubernetes client is optional; without it we always shell out
+    use_api = cfg.backend == "api" and kube_api.available()
+    from_cache = False
+    if use_api:
+        pods = kube_api.iter_pods(ns, selector, match)
+    else:
+        # decided up front so --show-command can say whether kubectl actually runs
+        pods = None if no_cache else kube.cached_pods(ns, selector, match)
+        from_cache = pods is not None
+        if pods is None:
+            pods = kube.fetch_pods(ns, selector, match, write_cache=not no_cache)
+
+    # Show the actual kubectl command (or API request) if requested
+    if show_command:
+        if use_api:
+            _note(console, f"Requesting: GET {kube_api.pods_path(ns, selector)}", "dim")
+        else:
+            cmd = ["kubectl", *kube.pods_args(ns, selector)]
+            if from_cache:
+                _note(console, f"Cached (kubectl not run, use --no-cache to refresh): {shlex.join(cmd)}", "dim")
+            else:
+                _note(console, f"Running: {shlex.join(cmd)}", "dim")
+
+    # single pass: the name filter runs inside the parser (rejected pods are never
+    # fully decoded), pod_state() is evaluated once per pod, and under --bad
+    # healthy pods are dropped right away instead of being kept for rendering
+    rows: list[tuple[str, str, bool]] = []
+    counts: Counter[str] = Counter()
+    total = 0
+    problematic = 0
+    for pod in pods:
         name = pod["metadata"]["name"]
-        if svc and svc not in name:
-            continue
-        if search and not re.search(search, name):
+        state, bad = pod_state(pod)
+        total += 1
+        counts[state] += 1
+        if bad:
+            problematic += 1
+        elif bad_only:
             continue
-        filtered.append(pod)
+        rows.append((name, state, bad))
+
+    if not total:
+        _note(console, "No pods matched", "yellow")
+        sys.exit(1)
 
-    if not filtered:
-        console.print("[yellow]No pods matched[/yellow]")
-        raise typer.Exit(1)
+    # everything is rendered up front and written with a single stdout write
+    if console is None:
+        # tab-separated, no styling: cheap to print and easy to grep/awk
+        lines = [f"{name}\t{state}\t{'YES' if bad else ''}" for name, state, bad in rows]
+        if summary:
+            lines.append("Summary: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+            lines.append(f"Total: {total}  Problematic: {problematic}")
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+        return
+
+    from rich.table import Table
 
     table = Table(title=f"Pods in {ns}")
     table.add_column("Pod")
     table.add_column("State")
     table.add_column("Bad")
 
-    counts: dict[str, int] = {}
-    bad_pods = []
+    for name, state, bad in rows:
+        table.add_row(name, state, "YES" if bad else "")
 
-    for pod in filtered:
-        state, bad = pod_state(pod)
-        counts[state] = counts.get(state, 0) + 1
-        if bad:
-            bad_pods.append(pod)
+    with console.capture() as capture:
+        console.print(table)
 
-    show = bad_pods if bad_only else filtered
-    for pod in show:
-        name = pod["metadata"]["name"]
-        state, bad = pod_state(pod)
-        table.add_row(name, state, "YES" if bad else "")
+        if summary:
+            console.print(
+                "[bold]Summary:[/bold] "
+                + ", ".join(f"{k}={v}" for k, v in counts.items())
+            )
+            console.print(
+                f"[bold]Total:[/bold] {total}  "
+                f"[bold]Problematic:[/bold] {problematic}"
+            )
+
+    sys.stdout.write(capture.get())
 
-    console.print(table)
 
-    if summary:
-        console.print(
-            "[bold]Summary:[/bold] "
-            + ", ".join(f"{k}={v}" for k, v in counts.items())
-        )
-        console.print(
-            f"[bold]Total:[/bold] {len(filtered)}  "
-            f"[bold]Problematic:[/bold] {len(bad_pods)}"
-        )
+# (option names, takes a value?, pods_impl keyword); add new options here
+_OPTIONS: list[tuple[tuple[str, ...], bool, str]] = [
+    (("--summary",), False, "summary"),
+    (("--bad",), False, "bad_only"),
+    (("--show-command", "--showCommand"), False, "show_command"),
+    (("--no-cache",), False, "no_cache"),
+    (("--plain",), False, "plain"),
+    (("-n", "--ns"), True, "namespace"),
+    (("-s", "--search"), True, "search"),
+]
 
+# option -> pods_impl keyword it sets, built once from _OPTIONS
+_FLAGS = {name: dest for names, valued, dest in _OPTIONS if not valued for name in names}
+_VALUED = {name: dest for names, valued, dest in _OPTIONS if valued for name in names}
+_ALIASES = {name: "/".join(names) for names, _, _ in _OPTIONS for name in names}
 
-def parse_args(argv: List[str]) -> Tuple[Optional[str], Optional[str], Optional[str], bool, bool, bool]:
+
+def parse_args(argv: List[str]) -> dict[str, Any]:
     """
     Accepts both:
       k oss-primary --summary
       k pods oss-primary --summary
-    And allows options anywhere.
+    And allows options anywhere. Returns keyword arguments for pods_impl.
     """
     # Strip optional leading "pods"
     args = argv[:]
     if args and args[0] == "pods":
         args = args[1:]
 
-    service: Optional[str] = None
-    namespace: Optional[str] = None
-    search: Optional[str] = None
-    summary = False
-    bad_only = False
-    show_command = False
+    opts: dict[str, Any] = {"services": []}
+    for _, valued, dest in _OPTIONS:
+        opts[dest] = None if valued else False
 
     i = 0
     while i < len(args):
         a = args[i]
 
-        if a in ("--summary",):
-            summary = True
+        if a in _FLAGS:
+            opts[_FLAGS[a]] = True
             i += 1
             continue
 
-        if a in ("--bad",):
-            bad_only = True
-            i += 1
-            continue
-
-        if a in ("--show-command", "--showCommand"):
-            show_command = True
-            i += 1
-            continue
-
-        if a in ("-n", "--ns"):
+        if a in _VALUED:
             if i + 1 >= len(args):
-                raise typer.BadParameter("Missing value after -n/--ns")
-            namespace = args[i + 1]
+                raise UsageError(f"Missing value after {_ALIASES[a]}")
+            opts[_VALUED[a]] = args[i + 1]
             i += 2
             continue
 
-        if a in ("-s", "--search"):
-            if i + 1 >= len(args):
-                raise typer.BadParameter("Missing value after -s/--search")
-            search = args[i + 1]
-            i += 2
-            continue
-
-        # First non-flag token becomes service (oss-primary etc.)
-        if not a.startswith("-") and service is None:
-            service = a
-            i += 1
-            continue
+        # Non-flag tokens are service tags (oss-primary etc.)
+        if not a.startswith("-"):
+            opts["services"].append(a)
 
         # Ignore anything unknown for now
         i += 1
 
-    return service, namespace, search, summary, bad_only, show_command
+    return opts
 
 
 def _main_impl(args: List[str]):
     """Internal implementation that parses args and calls pods_impl"""
-    service, namespace, search, summary, bad_only, show_command = parse_args(args)
-    pods_impl(service, namespace, search, summary, bad_only, show_command)
-
-
-@app.command("pods", context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
-def pods_cmd(ctx: typer.Context):
-    """List pods (can be called as 'k pods' or just 'k')"""
-    # For the pods command, use ctx.args (everything after 'pods')
-    # But we need to handle the case where 'pods' itself is in sys.argv
-    # So we'll use sys.argv and strip 'pods' if it's the first arg
-    args = sys.argv[1:] if len(sys.argv) > 1 else []
-    if args and args[0] == "pods":
-        args = args[1:]
-    _main_impl(args)
-
-
-@app.callback(invoke_without_command=True)
-def main(ctx: typer.Context):
-    """
-    List pods. Usage examples:
-      k oss-primary --summary
-      k pods oss-primary --summary
-      k --search pattern
-    """
-    # Always use sys.argv to bypass Typer's command matching
-    # Skip the first argument (command name 'k')
-    args = sys.argv[1:] if len(sys.argv) > 1 else []
-    _main_impl(args)
-
-
-@ctx_app.command("use")
-def use_ctx(
-    region: str = typer.Argument(..., help="Alias like us-west-2"),
-    show_command: bool = typer.Option(False, "--show-command", "--showCommand", help="Show the actual kubectl command"),
-):
-    cfg = load_config()
-    real_ctx = cfg.contexts.get(region, region)
-    cmd = ["kubectl", "config", "use-context", real_ctx]
-    if show_command:
-        console.print(f"[dim]Running: {' '.join(cmd)}[/dim]")
-    subprocess.run(cmd, check=False)
-
-
-@ctx_app.command("show")
-def show_ctx(
-    show_command: bool = typer.Option(False, "--show-command", "--showCommand", help="Show the actual kubectl command"),
-):
-    cmd = ["kubectl", "config", "current-context"]
-    if show_command:
-        console.print(f"[dim]Running: {' '.join(cmd)}[/dim]")
-    subprocess.run(cmd, check=False)
+    pods_impl(**parse_args(args))
 
 
-# Wrapper function to handle arguments before Typer parses them
 def main_wrapper():
     """
-    Entry point wrapper that intercepts sys.argv before Typer sees it.
-    This allows us to handle both 'k oss-primary --summary' and 'k pods oss-primary --summary'
-    without Typer trying to match 'oss-primary' or 'pods' as commands.
+    Entry point for 'k'. We parse argv ourselves so both 'k oss-primary --summary'
+    and 'k pods oss-primary --summary' work with options in any order; Typer is
+    only imported for the 'k ctx ...' subcommands.
     """
-    # Always parse arguments directly and call the implementation
-    # This bypasses Typer's command matching which would error on unknown commands
-    args = sys.argv[1:] if len(sys.argv) > 1 else []
-    _main_impl(args)
+    args = sys.argv[1:]
+    if args and args[0] == "ctx":
+        from .ctx import ctx_app
+
+        ctx_app(args=args[1:], prog_name="k ctx")
+        return
+
+    try:
+        _main_impl(args)
+    except (UsageError, ConfigError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    except KubectlError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -1,28 +1,75 @@
 from __future__ import annotations
-from dataclasses import dataclass
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-import yaml
+from typing import Optional
 
 CONFIG_PATH = Path.home() / ".ktool" / "config.yaml"
 
+BACKENDS = ("kubectl", "api")
+
+class ConfigError(ValueError):
+    pass
+
 @dataclass
 class KToolConfig:
     default_namespace: str
     contexts: dict[str, str]
     services: dict[str, str]
+    selectors: dict[str, str]
+    # tag -> compiled literal pattern for its service name, built once at load time
+    resolved_services: dict[str, re.Pattern[str]] = field(default_factory=dict)
+    # "kubectl" shells out per call; "api" talks to the apiserver via the kubernetes client
+    backend: str = "kubectl"
 
 def load_config() -> KToolConfig:
-    if not CONFIG_PATH.exists():
+    try:
+        mtime: Optional[int] = CONFIG_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    return _load_cached(CONFIG_PATH, mtime)
+
+@lru_cache(maxsize=1)
+def _load_cached(path: Path, mtime: Optional[int]) -> KToolConfig:
+    # keyed on mtime so the file is parsed once per process, but edits are still picked up
+    if mtime is None:
         # sensible defaults if user hasn't created config yet
         return KToolConfig(
             default_namespace="default",
             contexts={},
             services={},
+            selectors={},
         )
 
-    data = yaml.safe_load(CONFIG_PATH.read_text()) or {}
+    # imported here so runs without a config file never load PyYAML
+    import yaml
+
+    # libyaml-backed loader when PyYAML was built with it, pure-Python otherwise
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    data = yaml.load(path.read_bytes(), Loader=loader) or {}
+
+    # a service is either a name substring or {label: "app=..."} for server-side filtering
+    services: dict[str, str] = {}
+    selectors: dict[str, str] = {}
+    for tag, value in (data.get("services", {}) or {}).items():
+        if isinstance(value, dict):
+            if not value.get("label"):
+                raise ConfigError(f"{path}: service '{tag}' is a mapping but has no 'label'")
+            selectors[tag] = value["label"]
+        else:
+            # an empty value ("w:") means no name filter for that tag
+            services[tag] = "" if value is None else str(value)
+
+    backend = data.get("backend", "kubectl")
+    if backend not in BACKENDS:
+        raise ConfigError(f"{path}: unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
     return KToolConfig(
         default_namespace=data.get("default_namespace", "default"),
         contexts=data.get("contexts", {}) or {},
-        services=data.get("services", {}) or {},
+        services=services,
+        selectors=selectors,
+        resolved_services={tag: re.compile(re.escape(name)) for tag, name in services.items() if name},
+        backend=backend,
     )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import subprocess
+
+import typer
+from rich.console import Console
+
+from .config import ConfigError, load_config
+
+ctx_app = typer.Typer(add_completion=False, help="Context shortcuts (like kubectx)")
+
+console = Console()
+
+
+@ctx_app.command("use")
+def use_ctx(
+    region: str = typer.Argument(..., help="Alias like us-west-2"),
+    show_command: bool = typer.Option(False, "--show-command", "--showCommand", help="Show the actual kubectl command"),
+):
+    try:
+        cfg = load_config()
+    except ConfigError as e:
+        console.print(f"[red]Error:[/red] {e}")
+        raise typer.Exit(2)
+    real_ctx = cfg.contexts.get(region, region)
+    cmd = ["kubectl", "config", "use-context", real_ctx]
+    if show_command:
+        console.print(f"[dim]Running: {' '.join(cmd)}[/dim]")
+    subprocess.run(cmd, check=False)
+
+
+@ctx_app.command("show")
+def show_ctx(
+    show_command: bool = typer.Option(False, "--show-command", "--showCommand", help="Show the actual kubectl command"),
+):
+    cmd = ["kubectl", "config", "current-context"]
+    if show_command:
+        console.print(f"[dim]Running: {' '.join(cmd)}[/dim]")
+    subprocess.run(cmd, check=False)
@@ -1,30 +1,173 @@
 from __future__ import annotations
 
-import json
+import hashlib
+import os
 import subprocess
-from typing import Any
+import tempfile
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator, Optional
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # optional: faster parsing of large pod listings
+    import json
+
+    _loads = json.loads
+
+# only the fields pod_state() reads; annotations, managedFields, specs etc. stay on the apiserver
+POD_JSONPATH = (
+    '{range .items[*]}'
+    '{.metadata.name}{"\\t"}{.status.phase}{"\\t"}{.status.containerStatuses}{"\\n"}'
+    '{end}'
+)
+
+# repeated `k` runs within this many seconds reuse the previous kubectl output
+CACHE_TTL = 5.0
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ktool"
 
 
 class KubectlError(RuntimeError):
     pass
 
 
-def run_kubectl(args: list[str]) -> str:
+def run_kubectl(args: list[str], stream: bool = False, stderr: Optional[IO[bytes]] = None):
+    # stdout is returned/streamed as bytes; orjson and json both parse bytes directly
+    if stream:
+        # caller reads p.stdout incrementally and checks p.returncode once done.
+        # stderr must be a file, not a pipe: it is only read after stdout hits EOF,
+        # and a pipe full of warnings would block kubectl while we wait on stdout
+        return subprocess.Popen(
+            ["kubectl", *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL if stderr is None else stderr,
+        )
+
     p = subprocess.run(
         ["kubectl", *args],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
 
     if p.returncode != 0:
-        raise KubectlError(p.stderr.strip())
+        raise KubectlError(p.stderr.decode(errors="replace").strip())
 
     return p.stdout
 
 
-def get_pods_json(namespace: str) -> dict[str, Any]:
-    out = run_kubectl(
-        ["get", "pods", "-n", namespace, "-o", "json"]
-    )
-    return json.loads(out)
+def pods_args(namespace: str, selector: Optional[str] = None) -> list[str]:
+    args = ["get", "pods", "-n", namespace, "-o", f"jsonpath={POD_JSONPATH}"]
+    if selector:
+        # let the apiserver do the filtering instead of shipping the whole namespace
+        args += ["-l", selector]
+    return args
+
+
+def parse_pod_line(line: bytes, name_filter: Optional[Callable[[str], Any]] = None) -> Optional[dict[str, Any]]:
+    """
+    Rebuild the subset of a pod object that POD_JSONPATH emits for one pod,
+    or return None if name_filter rejects it. The name column is checked
+    before the containerStatuses JSON is decoded, so rejected pods cost
+    a split and a decode rather than a JSON parse.
+    """
+    raw_name, phase, container_statuses = line.rstrip(b"\n").split(b"\t", 2)
+    name = raw_name.decode()
+    if name_filter and not name_filter(name):
+        return None
+
+    status: dict[str, Any] = {}
+    if phase:
+        status["phase"] = phase.decode()
+    if container_statuses:
+        status["containerStatuses"] = _loads(container_statuses)
+    return {"metadata": {"name": name}, "status": status}
+
+
+def _cache_path(namespace: str, selector: Optional[str]) -> Path:
+    # the kubeconfig mtime stands in for the current context: `kctx use` rewrites it,
+    # which invalidates the cache without spending a kubectl call on current-context
+    kubeconfigs = os.environ.get("KUBECONFIG") or str(Path.home() / ".kube" / "config")
+    parts = [namespace, selector or "", POD_JSONPATH]
+    for cfg in kubeconfigs.split(os.pathsep):
+        try:
+            parts.append(f"{cfg}@{os.stat(cfg).st_mtime_ns}")
+        except OSError:
+            parts.append(cfg)
+    key = hashlib.sha1("\0".join(parts).encode()).hexdigest()
+    return CACHE_DIR / f"{key}.txt"
+
+
+def _read_cache(path: Path) -> Optional[bytes]:
+    try:
+        if time.time() - path.stat().st_mtime >= CACHE_TTL:
+            return None
+        return path.read_bytes()
+    except OSError:
+        return None
+
+
+def _write_cache(path: Path, data: bytes) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # atomic: concurrent runs never see a half-written file
+        os.replace(tmp, path)
+    except OSError:
+        # caching is best-effort
+        pass
+
+
+def _parse_lines(
+        lines: Iterable[bytes], name_filter: Optional[Callable[[str], Any]]
+) -> Iterator[dict[str, Any]]:
+    for line in lines:
+        if not line.strip():
+            continue
+        pod = parse_pod_line(line, name_filter)
+        if pod is not None:
+            yield pod
+
+
+def cached_pods(
+        namespace: str,
+        selector: Optional[str] = None,
+        name_filter: Optional[Callable[[str], Any]] = None,
+) -> Optional[Iterator[dict[str, Any]]]:
+    """Pods from a fresh cache entry (see CACHE_TTL), or None if kubectl has to run."""
+    cached = _read_cache(_cache_path(namespace, selector))
+    if cached is None:
+        return None
+    return _parse_lines(cached.splitlines(), name_filter)
+
+
+def fetch_pods(
+        namespace: str,
+        selector: Optional[str] = None,
+        name_filter: Optional[Callable[[str], Any]] = None,
+        write_cache: bool = True,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield pods one line at a time while kubectl is still writing. The raw
+    output is kept and written to the cache so back-to-back invocations
+    skip the kubectl round-trip.
+    """
+    lines: list[bytes] = []
+    with tempfile.TemporaryFile() as stderr:
+        with run_kubectl(pods_args(namespace, selector), stream=True, stderr=stderr) as p:
+            for line in p.stdout:
+                if write_cache:
+                    lines.append(line)
+                yield from _parse_lines((line,), name_filter)
+
+        # Popen.__exit__ has waited for kubectl, so stderr is complete
+        if p.returncode != 0:
+            stderr.seek(0)
+            raise KubectlError(stderr.read().decode(errors="replace").strip())
+
+    if write_cache:
+        _write_cache(_cache_path(namespace, selector), b"".join(lines))
+
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import importlib.util
+from functools import lru_cache
+from typing import Any, Callable, Iterator, Optional
+from urllib.parse import urlencode
+
+from .kube import KubectlError, _loads
+
+
+def available() -> bool:
+    return importlib.util.find_spec("kubernetes") is not None
+
+
+@lru_cache(maxsize=1)
+def _core_api():
+    # one client (and TLS connection pool) per process instead of a kubectl fork per call
+    from kubernetes import client, config
+
+    config.load_kube_config()
+    return client.CoreV1Api()
+
+
+def pods_path(namespace: str, selector: Optional[str] = None) -> str:
+    path = f"/api/v1/namespaces/{namespace}/pods"
+    if selector:
+        path += "?" + urlencode({"labelSelector": selector})
+    return path
+
+
+def iter_pods(
+        namespace: str,
+        selector: Optional[str] = None,
+        name_filter: Optional[Callable[[str], Any]] = None,
+) -> Iterator[dict[str, Any]]:
+    from kubernetes.client.exceptions import ApiException
+    from kubernetes.config import ConfigException
+    from urllib3.exceptions import HTTPError
+
+    try:
+        api = _core_api()
+    except ConfigException as e:
+        # e.g. no kubeconfig, or its current context doesn't exist
+        raise KubectlError(f"Cannot load kubeconfig: {e}") from e
+
+    try:
+        resp = api.list_namespaced_pod(
+            namespace,
+            label_selector=selector or "",
+            _preload_content=False,
+        )
+    except ApiException as e:
+        raise KubectlError(f"{e.status} {e.reason}: {e.body}") from e
+    except HTTPError as e:
+        # connection refused, TLS failures, timeouts
+        raise KubectlError(f"Cannot reach the apiserver: {e}") from e
+
+    # raw response: the pod dicts keep their API (camelCase) keys, same as kubectl's JSON
+    data = _loads(resp.data)
+    for pod in data.get("items", []) or []:
+        if name_filter and not name_filter(pod["metadata"]["name"]):
+            continue
+        yield pod